@@ -1,3 +1,9 @@
 from project.project import Project
-from project.csv2df import dump_df, read_csv
 
+
+def __getattr__(name):
+    # csv2df imports pandas, so only load it when its helpers are used
+    if name in ('dump_df', 'read_csv'):
+        from project import csv2df
+        return getattr(csv2df, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
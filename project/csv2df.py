@@ -1,19 +1,96 @@
-from os.path import basename, getsize, isfile
+import os
+from os.path import basename, getsize, isfile, split
+import sys
 import time
 import logging
 import json
-from io import StringIO
-from contextlib import redirect_stdout
+import re
 from functools import wraps
+from importlib.util import find_spec
+from itertools import islice
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_integer_dtype, is_numeric_dtype
 from humanfriendly import format_size
 import coloredlogs
 
+from project.project import _mtime_ns
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 logger = logging.getLogger(__name__)
-coloredlogs.install('INFO')
+logger.setLevel(logging.INFO)
+# Our messages go to their own handler (colored on terminals) and don't
+# propagate: the root logger is for the application to configure
+_LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s %(message)s'
+_log_handler = coloredlogs.StandardErrorHandler()
+if coloredlogs.terminal_supports_colors(sys.stderr):
+    _log_handler.setFormatter(coloredlogs.ColoredFormatter(_LOG_FORMAT))
+else:
+    _log_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+logger.addHandler(_log_handler)
+logger.propagate = False
+
+
+BINARY_FORMATS = ('.parquet', '.feather')
+
+# Compression used by dump_df for each file extension. These are fast levels,
+# which already shrink CSVs several times.
+COMPRESSIONS = {
+    '.gz': {'method': 'gzip', 'compresslevel': 1},
+    '.bz2': {'method': 'bz2', 'compresslevel': 1},
+    '.xz': {'method': 'xz', 'preset': 1},
+    '.zst': {'method': 'zstd', 'level': 1},
+}
+
+# Extensions read_csv will try, in this order, if the filepath doesn't exist
+READ_EXTENSIONS = (('.csv', '.tsv') +
+                   tuple(extension + compression
+                         for compression in COMPRESSIONS
+                         for extension in ('.csv', '.tsv')) +
+                   BINARY_FORMATS)
+IO_BUFFER_SIZE = 8 * 1024 * 1024
+
+# If any of these is passed to dump_df or read_csv, the file is handed to
+# pandas as a path instead of being opened here
+_FILE_KWARGS = {'compression', 'encoding', 'mode'}
+
+_HAS_PYARROW = find_spec('pyarrow') is not None
+
+# read_csv converts to 'category' the string columns with less distinct
+# values than this fraction of the number of rows
+CATEGORY_THRESHOLD = 0.5
+
+# Only JSON arrays and objects are parsed back to Python objects
+_JSON_STARTS = ('[', '{')
+
+
+if orjson:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _json_dumps(obj):
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode('utf-8')
+        except TypeError:
+            # e.g. integers over 64 bits, which json writes as they are
+            return json.dumps(obj)
+
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# orjson reads integers that don't fit in 64 bits as floats, so columns with
+# numbers this long are left to json.loads
+_LONG_NUMBER = re.compile(r'\d{20}')
+
+# Converters that decode JSON, to log the columns they parse like ours
+_JSON_LOADERS = {json.loads, _json_loads}
 
 
 def log_elapsed_time(func):
@@ -22,10 +99,13 @@ def log_elapsed_time(func):
 
     @wraps(func)
     def wrapped_function(*args, **kwargs):
-        t0 = time.time()
-        result = func(*args, **kwargs)
-        logger.info('Took {:.2f} seconds'.format(time.time() - t0))
-        return result
+        t0 = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if logger.isEnabledFor(logging.INFO):
+                elapsed = (time.perf_counter_ns() - t0) / 1e9
+                logger.info('Took %.2f seconds', elapsed)
 
     return wrapped_function
 
@@ -33,69 +113,123 @@ def log_elapsed_time(func):
 @log_elapsed_time
 def dump_df(df, filepath, index=None, **kwargs):
     """
-    Dump the dataframe to a CSV in the given filepath. Include '.tsv' in the
-    filepath to make it a TSV file!
+    Dump the dataframe to a CSV in the given filepath. Use a '.tsv' extension
+    to make it a TSV file! End the filepath with '.gz', '.bz2', '.xz' or
+    '.zst' to get it compressed (zstd needs the zstandard package).
+
+    The rows are formatted in chunks (of ~100,000 cells by default, pass a
+    *chunksize* in rows to change it) and written to a single large buffer,
+    so peak memory doesn't grow with the size of the CSV.
+
+    Integer dataframes dumped without their index and without extra options
+    are written with pyarrow's much faster CSV writer, if it's installed.
 
     It will try to JSONify Python objects if they're consistent.
 
     By default, the dataframe index will NOT be dumped if it's numeric. This
     behavior can be orverriden specifying index=True.
 
-    Extra **kwargs will be passed to pandas.DataFrame.to_csv()
+    If the filepath ends with '.parquet' or '.feather', the dataframe will be
+    written in that binary format instead (this needs pyarrow). Lists and
+    dicts are stored natively there, so nothing gets JSONified. It's much
+    faster to write and read back than a CSV, so it's the better choice for
+    intermediate results.
+
+    The *filepath* can also be a buffer or an open file (e.g. io.StringIO),
+    which gets a CSV unless another sep is passed.
+
+    Extra **kwargs will be passed to pandas.DataFrame.to_csv() (or to
+    to_parquet() / to_feather())
     """
-    nrows, ncols = df.shape
-    ncells = df.size
-    logger.info(f'Will dump a dataframe with {nrows:,} rows ' +
-                f'and {ncols:,} cols (number of cells: {ncells:,})')
+    if logger.isEnabledFor(logging.INFO):
+        nrows, ncols = df.shape
+        ncells = df.size
+        logger.info(f'Will dump a dataframe with {nrows:,} rows ' +
+                    f'and {ncols:,} cols (number of cells: {ncells:,})')
+
+    if index is None:
+        # Don't include the index if it's just numbers
+        # This guessing can be overriden by specifying 'index' as True
+        index = not is_numeric_dtype(df.index)
+
+    if isinstance(filepath, os.PathLike):
+        filepath = os.fspath(filepath)
+
+    if not isinstance(filepath, str):
+        # A buffer or an already open file: let pandas write the CSV to it
+        kwargs.setdefault('sep', ',')
+        _jsonify_columns(df).to_csv(filepath, index=index, **kwargs)
+        return filepath
+
+    if filepath.endswith(BINARY_FORMATS):
+        _dump_binary_df(df, filepath, index, **kwargs)
+        return filepath
 
     if 'sep' not in kwargs:
-        if '.tsv' in filepath:
-            kwargs['sep'] = '\t'
-        else:
-            kwargs['sep'] = ','
+        kwargs['sep'] = '\t' if _is_tsv(filepath) else ','
 
     if kwargs['sep'] == ',' and not '.csv' in filepath:
         filepath += '.csv'
 
-    if index is None:
-        # Don't include the index if it's just ordered numbers
-        # This guessing can be overriden by specifying 'index' as True
-        num_index_types = [
-            pd.core.indexes.range.RangeIndex,
-            pd.core.indexes.numeric.Int64Index
-        ]
-        index = (type(df.index) not in num_index_types)
-
-    columns_to_jsonify = []
-    for column_name, series in df.iteritems():
-        types = series.dropna().map(type).unique()
-        # I will JSONify a Series if all the non-null elements are from the
-        # same type and that type is either a list or a dict.
-        if len(types) == 1 and types[0] in (list, dict):
-            columns_to_jsonify.append(column_name)
+    compression = _compression_for(filepath)
+    if compression:
+        kwargs.setdefault('compression', compression)
 
-    if columns_to_jsonify:
-        # I need to copy the df to serialize some columns without modifying
-        # the original dataframe that was passed as an argument.
-        # TODO: There might be a better way to do this. Potential RAM hog.
-        df = df.copy()
-        for column_name in columns_to_jsonify:
-            logger.info('JSONify "{}"'.format(column_name))
-            df[column_name] = df[column_name].map(json.dumps)
+    df = _jsonify_columns(df)
 
-    logger.info('Writing to "{}"'.format(filepath))
-    df.to_csv(filepath, index=index, **kwargs)
-    logger.info('File "{}" is {}'.format(basename(filepath),
-                                         format_size(getsize(filepath))))
+    logger.info('Writing to "%s"', filepath)
+    if _can_use_pyarrow_writer(df, filepath, index, kwargs):
+        _write_csv_with_pyarrow(df, filepath, sep=kwargs['sep'])
+    elif _FILE_KWARGS.intersection(kwargs):
+        # Let pandas deal with the file opening and compression
+        df.to_csv(filepath, index=index, **kwargs)
+    else:
+        with _open_for_writing(filepath) as f:
+            df.to_csv(f, index=index, **kwargs)
+    _log_file_size(filepath)
 
     return filepath
 
 
+def _jsonify_columns(df):
+    """
+    Return the dataframe with its list and dict columns serialized as JSON.
+    The passed dataframe is left untouched.
+    """
+    # Only object columns can hold lists or dicts. I will JSONify a Series
+    # if its first non-null element is a list or a dict and a sample of
+    # the rest of the column agrees on that type.
+    columns_to_jsonify = [
+        column_name
+        for column_name in df.select_dtypes(include='object').columns
+        if _jsonifiable_type(df[column_name].values) is not None
+    ]
+
+    if columns_to_jsonify:
+        # A shallow copy lets me replace the serialized columns without
+        # modifying the original dataframe that was passed as an argument,
+        # while the untouched columns still share their data with it.
+        df = df.copy(deep=False)
+        for column_name in columns_to_jsonify:
+            logger.info('JSONify "%s"', column_name)
+            df[column_name] = df[column_name].map(_json_dumps)
+
+    return df
+
+
 @log_elapsed_time
-def read_csv(filepath, **kwargs):
+def read_csv(filepath, parse_json=True, categorize=True, parquet_cache=False,
+             **kwargs):
     """
     Wrapper function around pandas.read_csv: reads a CSV file into a
-    pandas.DataFrame.
+    pandas.DataFrame. Uncompressed files are memory mapped (pass
+    memory_map=False to read them with regular IO).
+
+    Pass engine='pyarrow' to parse the file with pandas' multithreaded
+    pyarrow engine instead, which is much faster on big files. It's not the
+    default because its output differs from the C engine's: empty fields
+    are read as '' instead of NaN, and unnamed or duplicate headers are not
+    renamed to 'Unnamed: 0' or 'a.1'.
 
     Aditionally, for each column it will try to parse the fields as JSON
     if the column has dtype=np.object (i.e. string), and convert them to
@@ -105,48 +239,385 @@ def read_csv(filepath, **kwargs):
     leave it as it is, like it isn't JSON. NaN values are handled and left
     as NaN after the parsing.
 
-    Extra **kwargs are passed to pd.read_csv().
+    Columns with a given dtype or converter are not parsed (nor converted
+    to categories), so pass converters={'col': orjson.loads} to decode JSON
+    columns of a known schema while reading. Set *parse_json* to False to
+    skip the JSON parsing altogether when you know there's no JSON in the
+    file: it saves a pass over every string column.
+
+    String columns with few distinct values (less than half the number of
+    rows) are converted to the 'category' dtype to save memory. Set
+    *categorize* to False to keep them as strings.
+
+    The file extension can be omitted: '.csv', '.tsv', their compressed
+    versions ('.csv.gz', '.tsv.gz', then '.bz2', '.xz' and '.zst'),
+    '.parquet' and '.feather' will be tried, in that order. TSV files are
+    read with a tab separator, unless you pass a *sep*.
+
+    Parquet and Feather files (i.e. with a '.parquet' or '.feather' extension)
+    are read with the corresponding pandas reader, and no JSON parsing is
+    needed for them (*parse_json* is ignored).
+
+    Set *parquet_cache* to keep a Parquet copy of the parsed dataframe next
+    to the CSV (e.g. 'data.csv.parquet') and read that copy instead later,
+    for as long as the CSV isn't modified. Dataframes with list or dict
+    values are not cached, since Parquet would read them back as arrays.
+    Each combination of *parse_json* and *categorize* gets its own cache
+    (e.g. 'data.csv.nojson.parquet' for parse_json=False), and the cache
+    can't be combined with extra options for pd.read_csv().
+
+    Extra **kwargs are passed to pd.read_csv() (or to pd.read_parquet() /
+    pd.read_feather()).
     """
-    if not isfile(filepath):
-        filepath += '.csv'
-    if not isfile(filepath):
-        filepath = filepath.replace('.csv', '.tsv')
-    if not isfile(filepath):
-        filepath = filepath.replace('.tsv', '')  # Undo the modifications
-        msg = "No file '{}' found.".format(filepath)
-        raise FileNotFoundError(msg)
+    filepath = _find_file(filepath)
+
+    cache_path = None
+    if parquet_cache and not filepath.endswith(BINARY_FORMATS):
+        if kwargs:
+            raise ValueError("parquet_cache can't be used with extra options "
+                             "for pd.read_csv()")
+        cache_path = _parquet_cache_path(filepath, parse_json, categorize)
+        # Taken before parsing, so a CSV rewritten meanwhile isn't taken
+        # as the source of the cache
+        source_stat = os.stat(filepath)
+        if _mtime_ns(cache_path) == source_stat.st_mtime_ns:
+            filepath, cache_path = cache_path, None
+
+    logger.info('Reading "%s"', basename(filepath))
+    if filepath.endswith(BINARY_FORMATS):
+        df = _read_binary_df(filepath, **kwargs)
+    else:
+        if _is_tsv(filepath) and not {'sep', 'delimiter'}.intersection(kwargs):
+            kwargs['sep'] = '\t'
+        if _compression_for(filepath) or _FILE_KWARGS.intersection(kwargs):
+            df = pd.read_csv(filepath, **kwargs)
+        elif kwargs.get('engine') == 'pyarrow':
+            with open(filepath, 'rb', buffering=IO_BUFFER_SIZE) as f:
+                df = pd.read_csv(f, **kwargs)
+        else:
+            # The C parser reads straight from the memory mapped file
+            kwargs.setdefault('memory_map', True)
+            df = pd.read_csv(filepath, **kwargs)
+
+        for colname, converter in kwargs.get('converters', {}).items():
+            if converter in _JSON_LOADERS:
+                logger.info('Parsed "%s" as JSON', colname)
+
+        # A single dtype for all columns means there's nothing to parse
+        dtype = kwargs.get('dtype', {})
+        if isinstance(dtype, dict):
+            typed_columns = set(dtype).union(kwargs.get('converters', {}))
+            JSON_columns = []
+            if parse_json:
+                JSON_columns = _parse_JSON_columns(df, typed_columns)
+            if categorize:
+                _categorize_columns(df, skip=typed_columns.union(JSON_columns))
+
+    if cache_path:
+        _write_parquet_cache(df, cache_path, filepath, source_stat)
+
+    # Measuring the memory of object columns means visiting every value
+    if logger.isEnabledFor(logging.INFO):
+        memory_usage = df.memory_usage(deep=True).sum()
+        logger.info('memory usage: %s', format_size(memory_usage))
+
+    return df
+
+
+def _parquet_cache_path(filepath, parse_json, categorize):
+    """
+    Path of the Parquet cache of a CSV read with the given options, e.g.
+    'data.csv.parquet' for the defaults and 'data.csv.nojson.parquet' with
+    parse_json=False.
+    """
+    options = ''
+    if not parse_json:
+        options += '.nojson'
+    if not categorize:
+        options += '.nocategories'
+    return filepath + options + '.parquet'
+
+
+def _write_parquet_cache(df, cache_path, source, source_stat):
+    """
+    Write the Parquet cache of the *source* CSV read as *df*. The cache gets
+    the modification time of the source in *source_stat* (taken before it
+    was read), which is how read_csv() tells the cache is up to date.
+    Nothing is written if the dataframe can't be stored as Parquet without
+    changing its values, and failing to write the cache only logs a warning.
+    """
+    if not _HAS_PYARROW:
+        logger.warning('Install pyarrow to use parquet_cache')
+        return
 
-    logger.info('Reading "{}"'.format(basename(filepath)))
-    df = pd.read_csv(filepath, **kwargs)
+    if any(_jsonifiable_type(df[column].values)
+           for column in df.select_dtypes('object').columns):
+        logger.info('Not caching "%s": it has list or dict values',
+                    basename(source))
+        return
 
+    try:
+        _dump_binary_df(df, cache_path, index=True)
+        os.utime(cache_path,
+                 ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    except (OSError, ValueError, TypeError) as error:
+        # e.g. a read-only data dir: the dataframe is still returned
+        logger.warning('Could not cache "%s": %s', basename(source), error)
+        if isfile(cache_path):
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+
+def _dump_binary_df(df, filepath, index, **kwargs):
+    """
+    Write the dataframe to Parquet or Feather, depending on the extension of
+    the filepath. Parquet is zstd-compressed unless a compression is passed.
+    Feather can't store an index, so it's written as a regular column if
+    *index* is set, or dropped otherwise.
+    """
+    logger.info('Writing to "%s"', filepath)
+    if filepath.endswith('.parquet'):
+        kwargs.setdefault('compression', 'zstd')
+        df.to_parquet(filepath, index=index, **kwargs)
+    else:
+        df.reset_index(drop=not index).to_feather(filepath, **kwargs)
+    _log_file_size(filepath)
+
+
+def _read_binary_df(filepath, **kwargs):
+    """
+    Read a Parquet or Feather file, depending on the extension of the
+    filepath. Keep in mind lists are read back as numpy arrays.
+    """
+    if filepath.endswith('.parquet'):
+        return pd.read_parquet(filepath, **kwargs)
+    return pd.read_feather(filepath, **kwargs)
+
+
+def _find_file(filepath):
+    """
+    Find the file read_csv was asked for: either *filepath* itself or
+    *filepath* plus one of the READ_EXTENSIONS. Instead of checking each
+    candidate, the directory is listed once. Raises FileNotFoundError if
+    there's no such file.
+    """
+    if isfile(filepath):
+        return filepath
+
+    directory, filename = split(filepath)
+    try:
+        with os.scandir(directory or '.') as entries:
+            filenames = {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        filenames = set()
+
+    for extension in READ_EXTENSIONS:
+        if filename + extension in filenames:
+            return filepath + extension
+
+    msg = "No file '{}' found.".format(filepath)
+    raise FileNotFoundError(msg)
+
+
+def _parse_JSON_columns(df, typed_columns):
+    """
+    Replace the columns of the dataframe that hold JSON with the parsed
+    Python objects. Columns in *typed_columns* are left alone, and so are
+    duplicate column names. Returns the names of the parsed columns.
+    """
     # Don't try to parse a column as JSON if a dtype was already specified
     # And only keep 'object' dtypes, since they have strings in them!
-    maybe_JSON_series = [series for colname, series in df.iteritems()
-                         if colname not in kwargs.get('dtype', {}) and
-                         series.dtype == np.dtype('object')]
-
+    skip = _duplicate_columns(df).union(typed_columns)
+    maybe_JSON_series = [df[colname] for colname
+                         in df.select_dtypes(include='object').columns
+                         if colname not in skip]
+    maybe_JSON_series = [series for series in maybe_JSON_series
+                         if _looks_like_JSON(series)]
+
+    parsed_columns = []
     for new_series in map(_series_as_JSON, maybe_JSON_series):
         if new_series is not None:
             df[new_series.name] = new_series
+            parsed_columns.append(new_series.name)
 
-    # Get the memory usage data from the DataFrame
-    captured_output = StringIO()
-    with redirect_stdout(captured_output):
-        df.info(memory_usage='deep')  # This function prints to stdout
+    return parsed_columns
 
-    info_lines = [line for line in captured_output.getvalue().split('\n')
-                  if 'memory' in line]
-    logger.info('\n'.join(info_lines))
 
-    return df
+def _categorize_columns(df, skip):
+    """
+    Convert the string columns of the dataframe that have few distinct
+    values (less than CATEGORY_THRESHOLD times the number of rows) to the
+    'category' dtype, which takes a fraction of the memory. Columns in *skip*
+    are left alone, and so are duplicate column names.
+    """
+    skip = _duplicate_columns(df).union(skip)
+    for colname in df.select_dtypes(include='object').columns:
+        if colname in skip:
+            continue
+        series = df[colname]
+        n_distinct = series.nunique(dropna=True)
+        if n_distinct < CATEGORY_THRESHOLD * len(series):
+            logger.info('Categorize "%s"', colname)
+            df[colname] = series.astype('category')
+
+
+def _duplicate_columns(df):
+    """
+    Return the column names that appear more than once (e.g. read with the
+    pyarrow engine, which doesn't rename them). df[name] is a dataframe for
+    them, not a single series.
+    """
+    return set(df.columns[df.columns.duplicated()])
+
+
+def _can_use_pyarrow_writer(df, filepath, index, kwargs):
+    """
+    Check if the dataframe can be written with pyarrow's CSV writer instead
+    of pandas': it has to be all numpy integers, without the index, to a
+    plain CSV file and with no extra options for DataFrame.to_csv. Floats
+    are left to pandas, since pyarrow writes 2.0 as 2, and so are nullable
+    integers: pyarrow writes an empty line for a null in a single column,
+    which is read back as no row at all. pyarrow also refuses duplicate
+    column names, and the names have to be strings to be written as given.
+    """
+    return (_HAS_PYARROW and
+            _is_plain_csv_dump(df, filepath, index, kwargs) and
+            df.columns.is_unique and
+            all(isinstance(column, str) for column in df.columns) and
+            all(isinstance(dtype, np.dtype) and is_integer_dtype(dtype)
+                for dtype in df.dtypes))
+
+
+def _is_plain_csv_dump(df, filepath, index, kwargs):
+    """
+    Check if dump_df was asked for a plain CSV file, without the index and
+    with no options for DataFrame.to_csv other than the separator.
+    """
+    return (not index and
+            set(kwargs) == {'sep'} and len(kwargs['sep']) == 1 and
+            not _compression_for(filepath) and
+            len(df.columns) > 0)
+
+
+def _write_csv_with_pyarrow(df, filepath, sep):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # pyarrow quotes every column name, so the header is written by pandas
+    # to keep the file the same with or without pyarrow
+    header = df.iloc[:0].to_csv(index=False, sep=sep)
+    write_options = pa_csv.WriteOptions(delimiter=sep, include_header=False)
+    with open(filepath, 'wb', buffering=IO_BUFFER_SIZE) as f:
+        f.write(header.encode('utf-8'))
+        pa_csv.write_csv(table, f, write_options=write_options)
+
+
+def _compression_for(filepath):
+    """
+    Return the compression options for pandas that correspond to the
+    extension of the filepath, or None if it's not a compressed file.
+    """
+    for extension, compression in COMPRESSIONS.items():
+        if filepath.endswith(extension):
+            return compression
+    return None
+
+
+def _is_tsv(filepath):
+    """Tell if the filepath has a '.tsv' extension, compressed or not."""
+    for extension in COMPRESSIONS:
+        if filepath.endswith(extension):
+            filepath = filepath[:-len(extension)]
+            break
+    return filepath.endswith('.tsv')
+
+
+def _open_for_writing(filepath):
+    """
+    Open a text file for writing with a large buffer, to save write()
+    syscalls on big dataframes.
+    """
+    return open(filepath, 'w', buffering=IO_BUFFER_SIZE, encoding='utf-8',
+                newline='')
+
+
+def _log_file_size(filepath):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info('File "%s" is %s', basename(filepath),
+                format_size(getsize(filepath)))
 
 
 def _series_as_JSON(series):
-    """Try to read a pandas Series as JSON. Returns None if it fails."""
-    try:
-        new_series = series.fillna('""').map(json.loads).replace('', np.nan)
-        logger.info('Parsed "{}" as JSON'.format(series.name))
-        return new_series
-    except ValueError:
+    """
+    Try to read a pandas Series as JSON. Returns None if it fails.
+
+    The values are parsed in a single pass, with nulls and empty strings left
+    as NaN. Check the Series with _looks_like_JSON() first to avoid trying
+    to parse columns of plain text.
+
+    Columns that orjson can't read exactly are parsed with json.loads: the
+    ones with NaN or Infinity (which json.dumps writes) or with integers
+    over 64 bits.
+    """
+    values = series.values
+    loaders = [json.loads]
+    if _json_loads is not json.loads and not any(
+            isinstance(value, str) and _LONG_NUMBER.search(value)
+            for value in values):
+        loaders.insert(0, _json_loads)
+
+    for loads in loaders:
+        try:
+            parsed = [np.nan if _is_null(value) or value == ''
+                      else loads(value) for value in values]
+            break
+        except (ValueError, TypeError):
+            continue
+    else:
         return None
 
+    logger.info('Parsed "%s" as JSON', series.name)
+    return pd.Series(parsed, index=series.index, name=series.name,
+                     dtype=object)
+
+
+def _looks_like_JSON(series, sample_size=16):
+    """
+    Cheap check to run before trying to parse a Series as JSON: the first
+    non-null values must be strings that start like a JSON array or object.
+    """
+    non_null_values = (value for value in series.values
+                       if not _is_null(value))
+    sample = list(islice(non_null_values, sample_size))
+    return bool(sample) and all(isinstance(value, str) and
+                                value.lstrip()[:1] in _JSON_STARTS
+                                for value in sample)
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _jsonifiable_type(values, sample_size=32):
+    """
+    Probe an object array for JSON-able values without calling type() on
+    every cell: take the type of the first non-null value and, if it's a list
+    or a dict, check that an evenly spaced sample of the array is made of
+    that same type (or nulls). Returns the type, or None if the values are
+    not JSON-able.
+    """
+    first = next((value for value in values if not _is_null(value)), None)
+    if type(first) not in (list, dict):
+        return None
+
+    sample_size = min(sample_size, len(values))
+    indices = np.linspace(0, len(values) - 1, num=sample_size, dtype=int)
+    if all(type(values[i]) is type(first) or _is_null(values[i])
+           for i in indices):
+        return type(first)
+
+    return None
@@ -1,21 +1,27 @@
-from os import mkdir
-from os.path import join, expanduser, abspath, basename, isdir, getsize, isfile
+import os
+from os.path import join, expanduser, abspath, basename, isdir, isabs, exists
 from pathlib import Path
-from glob import glob
+from fnmatch import translate
+from functools import lru_cache
 import re
 import logging
 
-import pandas as pd
-from humanfriendly import format_size
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-from project.csv2df import dump_df, read_csv
 
-
-logging.basicConfig(format='%(message)s')
 logger = logging.getLogger(__name__)
 logger.setLevel('INFO')
 
 
+FORMATS = ('csv', 'tsv', 'parquet', 'feather')
+
+# JSON orients read and written with orjson when no other options are passed
+_ORJSON_ORIENTS = ('split', 'records')
+
+
 class Project:
     """
     This class is meant to help you manage a project's directories and data
@@ -65,21 +71,35 @@ class Project:
 
     """
 
+    __slots__ = ('dir', 'name', 'data_dir', 'results_dir', '_subdir_paths',
+                 '_listing_cache')
+
+    # matplotlib.pyplot, imported on the first save_last_plot() call
+    _plt = None
+
     def __init__(self, base_dir):
         self.dir = abspath(expanduser(base_dir))
         self.name = basename(self.dir)
 
-        print('Initializing Project "{}"'.format(self.name))
-
-        self.data_dir = Path(join(self.dir, 'data'))
-        self.results_dir = Path(join(self.dir, 'results'))
-
-        for directory in [self.dir, self.data_dir, self.results_dir]:
-            if not isdir(directory):
-                print('Creating dir: {}'.format(directory))
-                mkdir(directory)
-            else:
-                print('Already exists: {}'.format(directory))
+        logger.debug('Initializing Project "%s"', self.name)
+
+        data_dir = f'{self.dir}{os.sep}data'
+        results_dir = f'{self.dir}{os.sep}results'
+        self.data_dir = Path(data_dir)
+        self.results_dir = Path(results_dir)
+        # Known subdirs as str, by name and by path, to avoid joining their
+        # paths (and converting the Path objects) on every lookup
+        self._subdir_paths = {
+            'data': data_dir, data_dir: data_dir, self.data_dir: data_dir,
+            'results': results_dir, results_dir: results_dir,
+            self.results_dir: results_dir,
+        }
+        # Cache of the directory trees listed: {directory: (mtimes, files)}
+        self._listing_cache = {}
+
+        # The base dir is created along with the subdirs if needed
+        os.makedirs(data_dir, exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
 
     @classmethod
     def from_notebook(cls):
@@ -107,20 +127,71 @@ class Project:
     def _files_in_subdir(self, subdir, pattern, regex):
         """
         List the files in subdir that match the given glob pattern or regex.
+        The directory tree is walked once, and the pattern is matched with
+        the semantics of glob(recursive=True): '**' matches any number of
+        subdirectories and wildcards don't match hidden names.
         """
-        all_files = glob(join(subdir, (pattern or '**')), recursive=True)
-        all_files = [fp for fp in all_files if isfile(fp)]
-
         if pattern and regex:
             raise ValueError("Specify pattern OR regex, not both!")
-        elif pattern:
-            files = [fn for fn in glob(join(subdir, pattern), recursive=True)]
+
+        subdir = self._subdir_paths.get(subdir, subdir)
+        if not isdir(subdir):
+            return []
+
+        files = self._list_files(subdir)
+        if pattern:
+            # Discard the paths that don't start with the literal part of the
+            # pattern before doing the actual matching
+            prefix_parts = _literal_prefix(pattern).split('/')
+            pattern_parts = pattern.split('/')
+            files = [(parts, fp) for parts, fp in files
+                     if _has_prefix(parts, prefix_parts) and
+                     _match_glob(parts, pattern_parts)]
         elif regex:
-            files = [fn for fn in all_files if re.search(regex, fn)]
+            search = _compile_regex(regex).search
+            files = [(parts, fp) for parts, fp in files
+                     if _is_visible(parts) and search(fp)]
         else:
-            files = all_files
+            # Same as matching '**', without running the matcher per file
+            files = [(parts, fp) for parts, fp in files if _is_visible(parts)]
+
+        return sorted(fp for _, fp in files)
+
+    def _list_files(self, directory):
+        """
+        List the files under *directory* (see _walk_files). The listing is
+        cached and reused for as long as the modification times of all the
+        directories in the tree stay the same, so adding or removing files
+        anywhere in the tree invalidates it.
+        """
+        directory = str(directory)
 
-        return sorted(files)
+        if directory in self._listing_cache:
+            mtimes, files = self._listing_cache[directory]
+            if all(_mtime_ns(d) == mtime for d, mtime in mtimes.items()):
+                return files
+
+        mtimes = {}
+        files = list(_walk_files(directory, mtimes))
+        self._listing_cache[directory] = (mtimes, files)
+        return files
+
+    def invalidate_cache(self):
+        """
+        Forget the cached listings of the project dirs. You shouldn't need
+        this unless the filesystem doesn't update the directories mtimes.
+        """
+        self._listing_cache.clear()
+
+    def _forget_listings(self, filepath):
+        """
+        Drop the cached listings of the trees that contain *filepath*, after
+        writing it. The next listing doesn't rely on the dirs mtimes to notice
+        the new file, which some filesystems don't update right away.
+        """
+        for directory in list(self._listing_cache):
+            if filepath.startswith(directory + os.sep):
+                del self._listing_cache[directory]
 
     def _file_in_subdir(self, subdir, filename, check_exists=False):
         """
@@ -131,14 +202,26 @@ class Project:
         glob pattern and check if there's only one file matching that
         pattern. If this is not the case, it will fail.
         """
-        filepath = join(self.dir, subdir, filename)
-
-        if check_exists and not isfile(filepath) and not isdir(filepath):
-
-            # Try the filename as a pattern or regex before failing:
-            matches = self._files_in_subdir(subdir,
-                                            pattern='**/*{}*'.format(filename),
-                                            regex=None)
+        known_subdir = self._subdir_paths.get(subdir)
+        if known_subdir and not isabs(filename):
+            subdir = known_subdir
+            filepath = f'{subdir}{os.sep}{filename}'
+        else:
+            subdir = known_subdir or join(self.dir, subdir)
+            filepath = join(subdir, filename)
+
+        # A single stat() tells if it's either an existing file or dir
+        if check_exists and not exists(filepath):
+
+            # Try the filename as a pattern before failing. A plain name is
+            # just searched in the cached listing of the subdir:
+            if _literal_prefix(filename) == filename and '/' not in filename:
+                files = self._list_files(subdir) if isdir(subdir) else []
+                matches = [fp for parts, fp in files
+                           if filename in parts[-1] and _is_visible(parts)]
+            else:
+                pattern = '**/*{}*'.format(filename)
+                matches = self._files_in_subdir(subdir, pattern, regex=None)
 
             # Don't accept ambiguous patterns!
             if len(matches) == 1:
@@ -152,7 +235,7 @@ class Project:
         """
         List all the files in /data that match the given glob pattern or regex.
         """
-        return self._files_in_subdir(self.data_dir, pattern, regex)
+        return self._files_in_subdir('data', pattern, regex)
 
     def data_file(self, filename, check_exists=True):
         """
@@ -160,13 +243,13 @@ class Project:
         the file or dir and raises if it's not there, unless *check_exists*
         is set to False.
         """
-        return self._file_in_subdir(self.data_dir, filename, check_exists)
+        return self._file_in_subdir('data', filename, check_exists)
 
     def results_files(self, pattern=None, regex=None):
         """
         List the files in /results that match the given glob pattern or regex.
         """
-        return self._files_in_subdir(self.results_dir, pattern, regex)
+        return self._files_in_subdir('results', pattern, regex)
 
     def results_file(self, filename, check_exists=False):
         """
@@ -175,7 +258,7 @@ class Project:
         If *check_exists* is set to True, checks the existence of either a
         file or a dir with the *filename* under self.results_dir.
         """
-        return self._file_in_subdir(self.results_dir, filename, check_exists)
+        return self._file_in_subdir('results', filename, check_exists)
 
     def dump_df_as_json(self, df, filename, subdir='results', **kwargs):
         """
@@ -183,6 +266,9 @@ class Project:
         subdir (default='results') with the given filename. Adds '.json' to the
         filename if not present.
 
+        If the filename ends with '.jsonl', the dataframe is written as line
+        delimited JSON instead: one record per line, without the index.
+
         'split' should be left as the default orient since it allows to
         preserve the columns order of the dataframe for later use. However,
         you can override this option with orient='records', for instance. If
@@ -191,59 +277,147 @@ class Project:
 
         Extra **kwargs are passed to pandas.DataFrame.to_json().
         """
-        if not filename.endswith('json'):
+        if not filename.endswith(('.json', '.jsonl')):
             filename += '.json'
         filepath = self._file_in_subdir(subdir, filename)
-        if not 'orient' in kwargs:
-            kwargs['orient'] = 'split'
-        df.to_json(filepath, **kwargs)
-        size = format_size(getsize(filepath))
-        logger.info('Dumped a {} JSON to {}'.format(size, filepath))
+        _set_default_json_options(filepath, kwargs)
+
+        payload = None
+        if _can_use_orjson(kwargs):
+            payload = _dumps_json(df, kwargs['orient'],
+                                  lines=kwargs.get('lines', False))
+
+        if payload is None:
+            df.to_json(filepath, **kwargs)
+        else:
+            with open(filepath, 'wb') as f:
+                f.write(payload)
+
+        if logger.isEnabledFor(logging.INFO):
+            from humanfriendly import format_size
+            size = format_size(os.stat(filepath).st_size)
+            logger.info('Dumped a %s JSON to %s', size, filepath)
+
+        self._forget_listings(filepath)
         return filepath
 
     def load_json_df(self, filename, subdir='results', **kwargs):
         """
         Read a JSON with the given filename to a pandas.DataFrame. It will
         search in the passed subdir (default='results') and it will try to
-        add '.json' to the filename if it fails.
+        add '.json' (or '.jsonl') to the filename if it fails.
 
-        The default orient is 'split', since it allows to keep the order of
-        the columns when serializing/deserializing. You can override this with
-        the 'orient' keyword argument, but the orient has to be consistent
-        with the format of the target JSON file.
+        '.jsonl' files are read as line delimited JSON records (see
+        dump_df_as_json). Otherwise, the default orient is 'split', since it
+        allows to keep the order of the columns when serializing/deserializing.
+        You can override this with the 'orient' keyword argument, but the
+        orient has to be consistent with the format of the target JSON file.
 
         Extra **kwargs are passed to pandas.read_json().
         """
+        import pandas as pd
+
         filepath = self._file_in_subdir(subdir, filename)
-        if not isfile(filepath) and isfile(filepath + '.json'):
-            filepath += '.json'
-        if not 'orient' in kwargs:
-            kwargs['orient'] = 'split'
+        if not filepath.endswith(('.json', '.jsonl')) and not exists(filepath):
+            if exists(filepath + '.jsonl') and not exists(filepath + '.json'):
+                filepath += '.jsonl'
+            else:
+                filepath += '.json'
+        _set_default_json_options(filepath, kwargs)
+
+        if _can_use_orjson(kwargs):
+            df = _loads_json(filepath, kwargs['orient'],
+                             lines=kwargs.get('lines', False))
+            if df is not None:
+                return df
+
         return pd.read_json(filepath, **kwargs)
 
-    def dump_df(self, df, filename, subdir='results', index=None, **kwargs):
+    def dump_df(self, df, filename, subdir='results', index=None, *,
+                format=None, **kwargs):
+        """
+        Dump a pandas.DataFrame with the given filename in the given subdir
+        (default='results'). Returns the path of the written file. The
+        filename can also be a buffer (e.g. io.BytesIO), which is written to
+        and returned as it is.
+
+        The *format* ('csv', 'tsv', 'parquet' or 'feather') is guessed from
+        the filename extension, CSV by default. If you pass it, the extension
+        will be added to the filename if it's not there. Parquet and Feather
+        are much faster to write and read back than CSV (they need pyarrow).
+
+        See project.csv2df.dump_df() for the options.
+        """
+        from project import csv2df
+
+        if not isinstance(filename, (str, os.PathLike)):
+            return csv2df.dump_df(df, filename, index, **kwargs)
+
+        if format:
+            filename = _with_extension(filename, format)
         filepath = self._file_in_subdir(subdir, filename)
-        dump_df(df, filepath, index, **kwargs)
+        filepath = csv2df.dump_df(df, filepath, index, **kwargs)
+        self._forget_listings(filepath)
         return filepath
 
-    def read_csv(self, filename, subdir='results', **kwargs):
+    def read_df(self, filename, subdir='results', *, format=None,
+                parse_json=True, categorize=True, parquet_cache=False,
+                **kwargs):
+        """
+        Read a CSV, TSV, Parquet or Feather file with the given filename from
+        the given subdir (default='results') to a pandas.DataFrame. The
+        extension can be omitted, or given as *format*.
+
+        Set *parquet_cache* to save a Parquet copy of a parsed CSV next to it
+        and read the copy on later calls, while the CSV stays unchanged.
+
+        See project.csv2df.read_csv() for the options.
+        """
+        if format:
+            filename = _with_extension(filename, format)
         filepath = self._file_in_subdir(subdir, filename)
-        return read_csv(filepath, **kwargs)
+        from project import csv2df
+        return csv2df.read_csv(filepath, parse_json=parse_json,
+                               categorize=categorize,
+                               parquet_cache=parquet_cache, **kwargs)
+
+    def read_csv(self, filename, subdir='results', **kwargs):
+        """
+        Alias of read_df(), which can read other formats besides CSV.
+        """
+        return self.read_df(filename, subdir=subdir, **kwargs)
 
-    def save_last_plot(self, filename, subdir='results'):
+    def save_last_plot(self, filename, subdir='results', bbox_inches='tight',
+                       dpi=None, **kwargs):
         """
         Save the last matplotlib plot to the given +filename+ under the given
         +subdir+.
+
+        bbox_inches='tight' crops the figure to its contents, at the cost of
+        an extra render of the figure to measure them. Pass bbox_inches=None
+        to save big figures faster. Extra **kwargs are passed to the
+        figure's savefig().
         """
-        try:
-            import matplotlib.pyplot as plt
-        except ImportError:
+        plt = self._get_plt()
+        if plt is None:
             logger.error("Seems you don't have matplotlib installed!")
             return
 
         filepath = self._file_in_subdir(subdir, filename)
-        plt.savefig(filepath, bbox_inches='tight')
-        logger.info('Written to {}'.format(filepath))
+        fig = plt.gcf()
+        fig.savefig(filepath, bbox_inches=bbox_inches, dpi=dpi, **kwargs)
+        self._forget_listings(filepath)
+        logger.info('Written to %s', filepath)
+
+    @classmethod
+    def _get_plt(cls):
+        if cls._plt is None:
+            try:
+                import matplotlib.pyplot as plt
+                cls._plt = plt
+            except ImportError:
+                cls._plt = False
+        return cls._plt or None
 
     ## This would be nice, but it's not functional so far:
 
@@ -271,3 +445,245 @@ class Project:
             #  if session['kernel']['id'] == kernel_id:
                 #  path = session['notebook']['path']
                 #  return basename(path).replace('.ipynb', '')
+
+
+def _mtime_ns(path):
+    """The mtime of a file or dir in nanoseconds, or None if it's missing."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _set_default_json_options(filepath, kwargs):
+    """
+    Default to the 'split' orient, or to one record per line for '.jsonl'
+    files.
+    """
+    if filepath.endswith('.jsonl'):
+        kwargs.setdefault('orient', 'records')
+        kwargs.setdefault('lines', True)
+    elif not 'orient' in kwargs:
+        kwargs['orient'] = 'split'
+
+
+def _can_use_orjson(kwargs):
+    return (orjson is not None and
+            {'orient'} <= kwargs.keys() <= {'orient', 'lines'} and
+            kwargs['orient'] in _ORJSON_ORIENTS and
+            (not kwargs.get('lines') or kwargs['orient'] == 'records'))
+
+
+def _dumps_json(df, orient, lines=False):
+    """
+    Serialize the dataframe to 'split' or 'records' formatted JSON with
+    orjson, which is much faster than DataFrame.to_json(). With *lines*, the
+    records are written one per line. Returns None if
+    the dataframe has values that pandas would serialize differently (e.g.
+    dates, which pandas writes as epoch milliseconds) or that orjson can't
+    handle, so the caller can fall back to pandas.
+    """
+    import pandas as pd
+    from pandas.api.types import is_numeric_dtype, is_object_dtype
+
+    axes_dtypes = [df.index.dtype, df.columns.dtype]
+    if (isinstance(df.index, pd.MultiIndex) or
+            isinstance(df.columns, pd.MultiIndex) or
+            not all(is_numeric_dtype(dtype) or is_object_dtype(dtype)
+                    for dtype in list(df.dtypes) + axes_dtypes)):
+        return None
+
+    if orient == 'split':
+        # The rows are built from the columns: df.values would upcast a
+        # frame of ints and floats to floats, and lose the large ints
+        columns = (df.iloc[:, i].tolist() for i in range(df.shape[1]))
+        data = list(zip(*columns)) if df.shape[1] else [()] * len(df)
+        payload = {
+            'columns': df.columns.tolist(),
+            'index': df.index.tolist(),
+            'data': data,
+        }
+    elif (orient == 'records' and df.columns.is_unique and
+            all(isinstance(column, str) for column in df.columns)):
+        payload = df.to_dict('records')
+    else:
+        return None
+
+    option = orjson.OPT_SERIALIZE_NUMPY
+    try:
+        if lines:
+            return b''.join(orjson.dumps(record, option=option) + b'\n'
+                            for record in payload)
+        return orjson.dumps(payload, option=option)
+    except TypeError:
+        return None
+
+
+def _loads_json(filepath, orient, lines=False):
+    """
+    Read a 'split' or 'records' formatted JSON with orjson and build the
+    dataframe from the parsed values. With *lines*, the file is parsed line
+    by line. Returns None for the files that need pandas.read_json(), which
+    casts the columns with date-like names and coerces some dtypes (see
+    _keeps_read_json_dtypes).
+    """
+    import pandas as pd
+
+    with open(filepath, 'rb') as f:
+        if lines:
+            payload = [orjson.loads(line) for line in f if line.strip()]
+        else:
+            payload = orjson.loads(f.read())
+
+    if orient == 'split':
+        columns = payload['columns']
+    else:
+        columns = list(payload[0]) if payload else []
+
+    if any(_is_default_date_column(column) for column in columns):
+        return None
+
+    if orient == 'split':
+        df = pd.DataFrame(payload['data'], index=payload.get('index'),
+                          columns=columns)
+    else:
+        df = pd.DataFrame.from_records(payload, columns=columns)
+
+    return df if _keeps_read_json_dtypes(df) else None
+
+
+def _keeps_read_json_dtypes(df):
+    """
+    Check that pandas.read_json() would read the same dtypes as the ones of
+    *df*, built from the parsed JSON values. read_json() turns integral
+    floats into ints and numeric strings (or bools with nulls) into numbers,
+    and it may convert an index of strings or floats, so the dataframes
+    with such values are left to it.
+    """
+    import numpy as np
+
+    if df.index.dtype.kind not in 'iu':
+        return False
+
+    for _, series in df.items():
+        values = series.values
+        if values.dtype.kind == 'f':
+            if np.isfinite(values).all() and (values % 1 == 0).all():
+                return False
+        elif values.dtype.kind == 'O':
+            try:
+                values.astype('float64')
+            except (TypeError, ValueError):
+                continue
+            return False
+
+    return True
+
+
+def _is_default_date_column(column):
+    """Mirror the column names pandas.read_json() parses as dates."""
+    if not isinstance(column, str):
+        return False
+    column = column.lower()
+    return (column.endswith(('_at', '_time')) or
+            column.startswith('timestamp') or
+            column in ('modified', 'date', 'datetime'))
+
+
+def _with_extension(filename, format):
+    """Add the extension of the given *format* to the filename if needed."""
+    if format not in FORMATS:
+        raise ValueError('Unknown format "{}", choose one of: {}'.format(
+            format, ', '.join(FORMATS)))
+
+    from project.csv2df import COMPRESSIONS
+
+    extension = '.' + format
+    extensions = (extension,) + tuple(extension + compression
+                                      for compression in COMPRESSIONS)
+    return filename if filename.endswith(extensions) else filename + extension
+
+
+def _walk_files(directory, mtimes, parents=()):
+    """
+    Walk the directory tree with os.scandir, yielding a tuple with the parts
+    of the path relative to *directory* and the full path of every file.
+    The modification time of every directory walked is stored in *mtimes*.
+    """
+    mtimes[directory] = _mtime_ns(directory)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            parts = parents + (entry.name, )
+            if entry.is_dir():
+                yield from _walk_files(entry.path, mtimes, parts)
+            elif entry.is_file():
+                yield parts, entry.path
+
+
+@lru_cache(maxsize=256)
+def _compile_regex(regex):
+    return re.compile(regex)
+
+
+@lru_cache(maxsize=256)
+def _fnmatcher(pattern):
+    """
+    Compiled match function for a glob pattern of a single path part. Unlike
+    fnmatch.fnmatch(), it doesn't call os.path.normcase() on every name:
+    case-insensitive systems get an IGNORECASE regex instead.
+    """
+    flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+    return re.compile(translate(pattern), flags).match
+
+
+def _literal_prefix(pattern):
+    """Return the part of a glob pattern before its first wildcard."""
+    match = re.search(r'[*?[]', pattern)
+    return pattern[:match.start()] if match else pattern
+
+
+def _has_prefix(parts, prefix_parts):
+    """
+    Check if a relative path, split in *parts*, starts with a literal prefix
+    split in *prefix_parts*.
+    """
+    *prefix_dirs, prefix_name = prefix_parts
+    n_dirs = len(prefix_dirs)
+    return (len(parts) > n_dirs and
+            list(parts[:n_dirs]) == prefix_dirs and
+            parts[n_dirs].startswith(prefix_name))
+
+
+def _is_visible(parts):
+    """Check that no part of a relative path is a hidden name."""
+    return not any(part.startswith('.') for part in parts)
+
+
+def _match_glob(parts, pattern_parts):
+    """
+    Check if a relative path, split in *parts*, matches a glob pattern split
+    in *pattern_parts*.
+    """
+    if not pattern_parts:
+        return not parts
+
+    head, rest = pattern_parts[0], pattern_parts[1:]
+
+    if head == '**':
+        for i in range(len(parts) + 1):
+            if _match_glob(parts[i:], rest):
+                return True
+            # '**' doesn't go into hidden directories
+            if i < len(parts) and parts[i].startswith('.'):
+                return False
+        return False
+
+    if not parts:
+        return False
+
+    name = parts[0]
+    if name.startswith('.') and not head.startswith('.'):
+        return False
+
+    return ((head == '*' or _fnmatcher(head)(name)) and
+            _match_glob(parts[1:], rest))
@@ -2,7 +2,8 @@ from setuptools import setup, find_packages
 
 
 with open('requirements.txt') as f:
-    dependencies = f.read().split('\n')
+    dependencies = [line.strip() for line in f
+                    if line.strip() and not line.startswith('#')]
 
 with open('README.md') as f:
     long_description = f.read()
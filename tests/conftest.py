@@ -0,0 +1,58 @@
+import shutil
+from os.path import dirname, realpath, join
+
+import pytest
+
+try:
+    # The same JSON decoder that read_csv uses, if it's installed
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+from project import Project
+
+
+TEST_PROJECT_DIR = join(dirname(realpath(__file__)), 'test_project')
+DATA_DIR = join(TEST_PROJECT_DIR, 'data')
+FILE_IN_SUBDIR = join(DATA_DIR, 'subdir', 'file_in_subdir.txt')
+DATA_FILE_JSON = join(DATA_DIR, 'data_file.json')
+DATA_FILE_TXT = join(DATA_DIR, 'data_file.txt')
+
+
+# Known schema of tests/test_project/data/data_file.csv
+FIXTURE_DTYPES = {'int_field': 'int32', 'string_field': 'string'}
+FIXTURE_CONVERTERS = {'dicts': json_loads, 'lists': json_loads}
+
+
+@pytest.fixture
+def data_file_schema():
+    """Options to read data_file.csv without inferring its columns types."""
+    return {'dtype': dict(FIXTURE_DTYPES),
+            'converters': dict(FIXTURE_CONVERTERS)}
+
+
+def pytest_configure(config):
+    # Built once, before collection, and shared by every test through the
+    # session-scoped pj fixture
+    config._test_project = Project(TEST_PROJECT_DIR)
+
+
+@pytest.fixture(scope='session')
+def pj(pytestconfig):
+    """The read-only project in tests/test_project."""
+    return pytestconfig._test_project
+
+
+@pytest.fixture(scope='session')
+def project_template(tmp_path_factory):
+    """An empty project, created once and copied by writable_pj."""
+    template_dir = tmp_path_factory.mktemp('project_template')
+    Project(str(template_dir))
+    return template_dir
+
+
+@pytest.fixture
+def writable_pj(tmp_path, project_template):
+    """An empty project in a temporary dir, for the tests that write files."""
+    shutil.copytree(project_template, tmp_path, dirs_exist_ok=True)
+    return Project(str(tmp_path))
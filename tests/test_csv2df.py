@@ -1,16 +1,96 @@
+import os
+import subprocess
+import sys
 from os.path import dirname, join, isfile
-from tempfile import gettempdir
+from io import StringIO
 
+import pytest
+import numpy as np
 import pandas as pd
 
-from project import read_csv, dump_df
+from project import read_csv, dump_df, csv2df
+from project.csv2df import (_jsonifiable_type, _looks_like_JSON,
+                             _series_as_JSON)
+
+
+REPO_DIR = dirname(dirname(os.path.abspath(__file__)))
 
 
 def test_read_csv():
     fn = join(dirname(__file__), 'test_project/data/data_file.csv')
     df = read_csv(fn)
-    assert all(type(item) is dict for item in df['dicts'])
-    assert all(type(item) is list for item in df['lists'])
+    assert df['dicts'].map(type).eq(dict).all()
+    assert df['lists'].map(type).eq(list).all()
+
+    # The extension can be omitted
+    assert read_csv(fn.replace('.csv', '')).shape == df.shape
+
+    with pytest.raises(FileNotFoundError):
+        read_csv(fn.replace('.csv', '.tsv'))
+
+    df = read_csv(fn, parse_json=False)
+    assert df['dicts'].map(type).eq(str).all()
+
+    df = read_csv(fn, dtype=str)
+    assert df['lists'].map(type).eq(str).all()
+
+    # Memory mapping the file doesn't change what's read
+    assert read_csv(fn, memory_map=False).equals(read_csv(fn))
+
+
+@pytest.mark.parametrize('content', [
+    'a,b\nx,\n,y\n',  # Empty fields
+    ',a\n0,x\n1,y\n',  # Unnamed index column
+    'a,a\n1,2\n3,4\n',  # Duplicate headers
+])
+def test_read_csv_matches_pandas(tmpdir, content):
+    filename = join(str(tmpdir), 'table.csv')
+    with open(filename, 'w') as f:
+        f.write(content)
+
+    df = read_csv(filename, parse_json=False, categorize=False)
+    assert df.equals(pd.read_csv(filename))
+
+    # Guessing the separator is left to pandas
+    df = read_csv(filename, sep=None, engine='python', parse_json=False,
+                  categorize=False)
+    assert df.equals(pd.read_csv(filename, sep=None, engine='python'))
+
+
+def test_read_csv_pyarrow_engine(tmpdir):
+    pytest.importorskip('pyarrow')
+    filename = join(str(tmpdir), 'table.csv')
+    pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}).to_csv(filename, index=False)
+
+    df = read_csv(filename, engine='pyarrow', categorize=False)
+    assert df.equals(read_csv(filename, categorize=False))
+
+    # pyarrow keeps duplicate names, which are left as they are read
+    with open(filename, 'w') as f:
+        f.write('a,a,b\nx,[1],y\nx,[2],y\nx,[3],y\n')
+    df = read_csv(filename, engine='pyarrow')
+    assert list(df.columns) == ['a', 'a', 'b']
+    assert df.dtypes.tolist() == [object, object, 'category']
+
+
+def test_read_csv_categorize(tmpdir):
+    filename = join(str(tmpdir), 'categories.csv')
+    pd.DataFrame({
+        'status': ['ok', 'ok', 'fail', 'ok', 'ok'],
+        'name': ['a', 'b', 'c', 'd', 'e'],
+        'lists': ['[1]', '[1]', '[1]', '[1]', '[1]'],
+    }).to_csv(filename, index=False)
+
+    df = read_csv(filename)
+    assert df['status'].dtype == 'category'
+    assert df['name'].dtype == object
+    assert df['lists'][0] == [1]
+
+    df = read_csv(filename, categorize=False)
+    assert df['status'].dtype == object
+
+    df = read_csv(filename, dtype={'status': str})
+    assert df['status'].dtype == object
 
 
 def test_dump_df(tmpdir):
@@ -20,8 +100,9 @@ def test_dump_df(tmpdir):
             'c': [{'a': 1}, {'b': 2}, {'c': 3}]
         })
 
-    filename = join(gettempdir(), '_test_dump')
+    filename = join(str(tmpdir), '_test_dump')
     result_filename = dump_df(df, filename)
+    assert df.loc[0, 'b'] == ['1']  # The original df is left untouched
     assert isfile(result_filename)
     assert result_filename == filename + '.csv'
 
@@ -31,7 +112,7 @@ def test_dump_df(tmpdir):
     assert new_df.shape == (3, 3)
 
     # Try a TSV instead of a CSV
-    filename = join(gettempdir(), '_test_dump.tsv')
+    filename = join(str(tmpdir), '_test_dump.tsv')
     result_filename = dump_df(df, filename)
     assert isfile(result_filename)
     assert result_filename == filename
@@ -41,3 +122,228 @@ def test_dump_df(tmpdir):
     assert all(new_df.columns == ['a', 'b', 'c'])
     assert new_df.shape == (3, 3)
 
+    # A non-numeric index is dumped
+    df.index = ['x', 'y', 'z']
+    result_filename = dump_df(df, filename)
+    new_df = pd.read_table(result_filename)
+    assert new_df.shape == (3, 4)
+
+
+def test_dump_df_to_buffer():
+    df = pd.DataFrame({'a': [1, 2], 'b': [['1'], ['2']]})
+
+    buffer = StringIO()
+    assert dump_df(df, buffer, sep='\t') is buffer
+    new_df = pd.read_table(StringIO(buffer.getvalue()))
+    assert new_df.loc[1, 'b'] == '["2"]'
+
+
+def test_dump_and_read_df_json_beyond_orjson(tmpdir):
+    # Columns that orjson can't write or read exactly
+    df = pd.DataFrame({'big': [[2**70], [1]], 'nan': [[1.0, np.nan], [2.0]]})
+    filename = dump_df(df, join(str(tmpdir), '_test_dump.csv'))
+    new_df = read_csv(filename)
+    assert new_df.loc[0, 'big'] == [2**70]
+    assert type(new_df.loc[0, 'big'][0]) is int
+    assert new_df.loc[1, 'nan'] == [2.0]
+
+    # CSVs written with json.dumps, like dump_df did before using orjson
+    with open(filename, 'w') as f:
+        f.write('nan,inf\n"[1.0, NaN]","[Infinity]"\n[2.0],[1]\n')
+    new_df = read_csv(filename)
+    assert new_df.loc[0, 'nan'][0] == 1.0 and np.isnan(new_df.loc[0, 'nan'][1])
+    assert new_df['inf'].tolist() == [[float('inf')], [1]]
+
+
+def test_jsonifiable_type():
+    assert _jsonifiable_type(np.array([None, [1], [2]], dtype=object)) is list
+    assert _jsonifiable_type(np.array([{'a': 1}, None], dtype=object)) is dict
+    assert _jsonifiable_type(np.array(['foo', [1]], dtype=object)) is None
+    assert _jsonifiable_type(np.array([[1], 'foo'], dtype=object)) is None
+    assert _jsonifiable_type(np.array([None, np.nan], dtype=object)) is None
+
+
+def test_series_as_JSON():
+    series = pd.Series([np.nan, '[1, 2]', '{"a": 1}', ''], name='foo')
+    parsed = _series_as_JSON(series)
+    assert parsed.name == 'foo'
+    assert np.isnan(parsed[0]) and np.isnan(parsed[3])
+    assert parsed[1] == [1, 2]
+    assert parsed[2] == {'a': 1}
+
+    assert _series_as_JSON(pd.Series(['plain text', '[1]'])) is None
+    assert _series_as_JSON(pd.Series(['[1]', '[not JSON'])) is None
+
+
+def test_looks_like_JSON():
+    assert _looks_like_JSON(pd.Series([np.nan, '[1, 2]', ' {"a": 1}']))
+    assert not _looks_like_JSON(pd.Series(['[1, 2]', 'plain text']))
+    assert not _looks_like_JSON(pd.Series(['"a JSON string"']))
+    assert not _looks_like_JSON(pd.Series([np.nan, None]))
+
+
+@pytest.mark.parametrize('has_pyarrow', [True, False])
+def test_dump_numeric_df(tmpdir, monkeypatch, has_pyarrow):
+    if has_pyarrow:
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(csv2df, '_HAS_PYARROW', has_pyarrow)
+
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [0.5, np.nan, 1e20]})
+    filename = join(str(tmpdir), '_test_dump.csv')
+    dump_df(df, filename)
+
+    new_df = pd.read_csv(filename)
+    assert list(new_df.columns) == ['a', 'b']
+    assert list(new_df['a']) == [1, 2, 3]
+    assert new_df['b'].isnull().tolist() == [False, True, False]
+    assert new_df.loc[2, 'b'] == 1e20
+
+    df = pd.DataFrame({'a': [0.1, 2.0], 'b': [1/3, 1e-20]})
+    dump_df(df, filename)
+    with open(filename) as f:
+        assert f.read().splitlines()[1] == '0.1,0.3333333333333333'
+    new_df = pd.read_csv(filename)
+    assert new_df.dtypes.tolist() == ['float64', 'float64']
+    assert (new_df.values == df.values).all()
+
+    # pyarrow's writer refuses duplicate column names, pandas doesn't
+    df = pd.DataFrame([[1, 2], [3, 4]], columns=['a', 'a'])
+    dump_df(df, filename)
+    assert pd.read_csv(filename).values.tolist() == [[1, 2], [3, 4]]
+
+    # Integer dumps are the same as pandas', header included
+    df = pd.DataFrame({'a': [1, 2], 'b c': [3, -4]})
+    dump_df(df, filename)
+    with open(filename) as f:
+        assert f.read() == df.to_csv(index=False)
+
+    # A null in a single nullable int column isn't written as an empty line
+    df = pd.DataFrame({'a': pd.array([1, None, 3], dtype='Int64')})
+    dump_df(df, filename)
+    assert len(read_csv(filename)) == 3
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.feather'])
+def test_dump_and_read_binary_df(tmpdir, extension):
+    pytest.importorskip('pyarrow')
+
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [['1'], ['2'], ['3']]})
+    filename = join(str(tmpdir), '_test_dump' + extension)
+    result_filename = dump_df(df, filename)
+    assert result_filename == filename
+
+    new_df = read_csv(filename.replace(extension, ''))
+    assert list(new_df.columns) == ['a', 'b']
+    assert list(new_df['a']) == [1, 2, 3]
+    assert [list(item) for item in new_df['b']] == [['1'], ['2'], ['3']]
+
+
+@pytest.mark.parametrize('extension', ['.gz', '.bz2', '.xz'])
+def test_dump_and_read_compressed_df(tmpdir, extension):
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [['1'], ['2'], ['3']]})
+    filename = join(str(tmpdir), '_test_dump.csv' + extension)
+    result_filename = dump_df(df, filename)
+    assert result_filename == filename
+
+    new_df = read_csv(result_filename)
+    assert list(new_df['a']) == [1, 2, 3]
+    assert list(new_df['b']) == [['1'], ['2'], ['3']]
+
+    # The extensions can be omitted
+    assert read_csv(filename[:-len('.csv' + extension)]).equals(new_df)
+
+
+def test_read_csv_parquet_cache(tmpdir):
+    pytest.importorskip('pyarrow')
+    filename = join(str(tmpdir), 'table.csv')
+    df = pd.DataFrame({'foo': [1.5, 2.5], 'bar': ['a', 'b']})
+    df.to_csv(filename, index=False)
+
+    df_read = read_csv(filename, parquet_cache=True)
+    assert isfile(filename + '.parquet')
+    assert read_csv(filename, parquet_cache=True).equals(df_read)
+
+    # The cache is only used while it's up to date with the CSV
+    df.assign(foo=[0.5, 0.5]).to_csv(filename, index=False)
+    mtime = os.stat(filename).st_mtime + 1
+    os.utime(filename, (mtime, mtime))
+    assert read_csv(filename, parquet_cache=True)['foo'].tolist() == [0.5, 0.5]
+    assert read_csv(filename + '.parquet')['foo'].tolist() == [0.5, 0.5]
+
+    with pytest.raises(ValueError):
+        read_csv(filename, parquet_cache=True, usecols=['foo'])
+
+    # Lists would be read back from Parquet as arrays
+    lists_filename = join(str(tmpdir), 'lists.csv')
+    pd.DataFrame({'lists': ['[1]', '[2]']}).to_csv(lists_filename, index=False)
+    assert read_csv(lists_filename, parquet_cache=True)['lists'][0] == [1]
+    assert not isfile(lists_filename + '.parquet')
+
+
+def test_read_csv_parquet_cache_options(tmpdir, monkeypatch):
+    pytest.importorskip('pyarrow')
+    filename = join(str(tmpdir), 'table.csv')
+    pd.DataFrame({'foo': ['a', 'a', 'a']}).to_csv(filename, index=False)
+
+    # Each set of options has its own cache
+    assert read_csv(filename, parquet_cache=True)['foo'].dtype == 'category'
+    df = read_csv(filename, parquet_cache=True, categorize=False)
+    assert df['foo'].dtype == object
+    assert isfile(filename + '.nocategories.parquet')
+    assert read_csv(filename, parquet_cache=True)['foo'].dtype == 'category'
+
+    # A CSV rewritten while it's parsed doesn't validate the cache
+    read_csv_from_pandas = pd.read_csv
+
+    def read_and_rewrite(*args, **kwargs):
+        df = read_csv_from_pandas(*args, **kwargs)
+        pd.DataFrame({'foo': ['b']}).to_csv(filename, index=False)
+        mtime = os.stat(filename).st_mtime + 1
+        os.utime(filename, (mtime, mtime))
+        return df
+
+    options = {'parquet_cache': True, 'parse_json': False}
+    monkeypatch.setattr(pd, 'read_csv', read_and_rewrite)
+    assert read_csv(filename, **options)['foo'][0] == 'a'
+    monkeypatch.undo()
+    assert read_csv(filename, **options)['foo'][0] == 'b'
+
+    # Failing to write the cache (e.g. a read-only dir) only warns
+    def fail_to_write(*args, **kwargs):
+        raise PermissionError('read-only')
+
+    monkeypatch.setattr(csv2df, '_dump_binary_df', fail_to_write)
+    os.remove(filename + '.parquet')
+    assert read_csv(filename, parquet_cache=True)['foo'].tolist() == ['b']
+    assert not isfile(filename + '.parquet')
+
+
+_CONFIGURE_LOGGING = """
+import logging
+logging.basicConfig(level=logging.WARNING, format='app: %(message)s')
+root_logger = logging.getLogger()
+handlers = list(root_logger.handlers)
+"""
+_IMPORT_CSV2DF = """
+from project import csv2df
+"""
+_CHECK_LOGGING = """
+assert root_logger.handlers == handlers
+assert root_logger.level == logging.WARNING
+csv2df.logger.info('Some message')
+"""
+
+
+@pytest.mark.parametrize('app_configures_first', [True, False])
+def test_logging_leaves_the_app_logging_alone(app_configures_first):
+    setup = [_CONFIGURE_LOGGING, _IMPORT_CSV2DF]
+    if not app_configures_first:
+        setup.reverse()
+    code = ''.join(setup) + _CHECK_LOGGING
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    # Printed once, by our own handler and not by the app's root handler
+    assert result.stderr.count('Some message') == 1
+    assert 'app: Some message' not in result.stderr
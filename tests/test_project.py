@@ -1,26 +1,19 @@
-from os import remove, getpid
-from tempfile import gettempdir
-from os.path import isdir, isfile, dirname, realpath, join
-from unittest.mock import MagicMock
-import json
-import requests
+from os import remove, mkdir
+from io import BytesIO
+from os.path import isdir, isfile, dirname, join
+from pathlib import Path
 
 import pytest
 import pandas as pd
-from IPython.lib import kernel
 
-from project import Project
+from project import Project, csv2df
+from project.project import _compile_regex
 
+from conftest import FILE_IN_SUBDIR, DATA_FILE_JSON, DATA_FILE_TXT
 
-TEST_DIR = dirname(realpath(__file__))
 
-@pytest.fixture
-def pj():
-    return Project(join(TEST_DIR, 'test_project'))
-
-
-def test_initialization():
-    dir_name = join(gettempdir(), 'test_project__'.format(getpid()))
+def test_initialization(tmp_path):
+    dir_name = str(tmp_path / 'test_project')
     Project(dir_name)  # This step should create all directories
 
     expected_directories = [
@@ -32,7 +25,14 @@ def test_initialization():
         assert isdir(directory)
 
     # A second initialization should not fail if the target directories exist
-    Project(dir_name)
+    pj = Project(dir_name)
+
+    assert pj.data_dir == Path(dir_name, 'data')
+    assert pj.results_dir / 'foo.csv' == Path(dir_name, 'results', 'foo.csv')
+
+    # Instances have no __dict__, only the attributes in __slots__
+    with pytest.raises(AttributeError):
+        pj.some_typo = 'foo'
 
 
 def test_file_in_subdir(pj):
@@ -49,19 +49,19 @@ def test_file_in_subdir(pj):
     unambiguous_pattern = '_in_subdir'
     result = pj._file_in_subdir(pj.data_dir, unambiguous_pattern,
                                 check_exists=True)
-    assert result == join(pj.dir, 'data/subdir/file_in_subdir.txt')
+    assert result == FILE_IN_SUBDIR
 
     # Unambiguous pattern in data dir
     unambiguous_pattern = 'file.json'
     result = pj._file_in_subdir(pj.data_dir, unambiguous_pattern,
                                 check_exists=True)
-    assert result == join(pj.dir, 'data/data_file.json')
+    assert result == DATA_FILE_JSON
 
     # Unambiguous but incomplete pattern
     unambiguous_pattern = 'file.tx'
     result = pj._file_in_subdir(pj.data_dir, unambiguous_pattern,
                                 check_exists=True)
-    assert result == join(pj.dir, 'data/data_file.txt')
+    assert result == DATA_FILE_TXT
 
     with pytest.raises(FileNotFoundError):
         ambiguous_pattern = 'data_*'
@@ -75,11 +75,49 @@ def test_data_files(pj):
         'data_file.json',
         'data_file.txt',
     ]
+    files = set(pj.data_files())
     for data_file in data_files:
-        assert join(pj.data_dir, data_file) in pj.data_files()
+        assert join(pj.data_dir, data_file) in files
 
     assert pj.data_files(pattern='*.csv')[0].endswith('data_file.csv')
+    assert pj.data_files('*.txt') == [DATA_FILE_TXT]
+    assert len(pj.data_files(pattern='**/*.txt')) == 2
+    assert len(pj.data_files(regex=r'\.(csv|txt)')) == 3
+
+    # The regex is compiled once and reused
+    hits = _compile_regex.cache_info().hits
     assert len(pj.data_files(regex=r'\.(csv|txt)')) == 3
+    assert _compile_regex.cache_info().hits == hits + 1
+
+def test_files_listing_is_refreshed(writable_pj):
+    pj = writable_pj
+    assert pj.results_files() == []
+
+    new_file = join(pj.results_dir, 'subdir', 'new_file.txt')
+    mkdir(dirname(new_file))
+    open(new_file, 'w').close()
+    assert pj.results_files() == [new_file]
+
+    remove(new_file)
+    assert pj.results_files() == []
+
+    assert pj._listing_cache
+    pj.invalidate_cache()
+    assert not pj._listing_cache
+
+
+def test_files_listing_skips_hidden_files(writable_pj):
+    pj = writable_pj
+    visible_file = join(pj.results_dir, 'a.csv')
+    mkdir(join(pj.results_dir, '.ipynb_checkpoints'))
+    for filename in ['a.csv', '.hidden.csv',
+                     '.ipynb_checkpoints/a-checkpoint.csv']:
+        open(join(pj.results_dir, filename), 'w').close()
+
+    assert pj.results_files() == [visible_file]
+    assert pj.results_files('**/*.csv') == [visible_file]
+    assert pj.results_files(regex='csv$') == [visible_file]
+
 
 def test_data_file(pj):
     assert pj.data_file('data_file.csv') == join(pj.data_dir, 'data_file.csv')
@@ -104,7 +142,8 @@ def test_results_file(pj):
 
 
 ## The code for this is not yet functional, and it's also commented out in
-## the Project class:
+## the Project class. If restored, these tests will need to import json,
+## requests, MagicMock and IPython.lib.kernel:
 
 #  def test_get_notebook_name(monkeypatch):
     #  fn = '/run/user/1000/jupyter/kernel-123-abc-lalala.json'
@@ -145,7 +184,8 @@ def test_load_json_df(pj):
         assert df.loc[1, 'foo'] == 'boo'
 
 
-def test_dump_df_as_json(pj):
+def test_dump_df_as_json(writable_pj):
+    pj = writable_pj
     df = pd.DataFrame([{'foo': 1, 'bar': 2},
                        {'foo': 3, 'bar': 4}])
 
@@ -153,18 +193,72 @@ def test_dump_df_as_json(pj):
     assert isfile(target_file)
 
     df_read = pj.load_json_df(target_file)
-    assert all(df == df_read)
+    assert df.equals(df_read)
+
+    target_file = pj.dump_df_as_json(df, 'test_dfjson')
+    assert target_file.endswith('test_dfjson.json')
+
+
+@pytest.mark.parametrize('orient', ['split', 'records'])
+def test_dump_df_as_json_large_ints(writable_pj, orient):
+    df = pd.DataFrame({'big': [2**60 + 1, 3], 'float': [0.5, 1.0]})
+
+    target_file = writable_pj.dump_df_as_json(df, 'test_df', orient=orient)
+    df_read = writable_pj.load_json_df(target_file, orient=orient)
+    assert df_read['big'].tolist() == [2**60 + 1, 3]
+    assert df_read.equals(df)
+
+
+@pytest.mark.parametrize('orient', ['split', 'records'])
+@pytest.mark.parametrize('data', [
+    {'a': [1.0, 2.0], 'b': ['1', '2']},  # Coerced by pandas.read_json
+    {'a': [1.5, None], 'b': [True, None], 'c': ['inf', '1']},
+    {'a': [1.5, 2.0], 'b': ['x', None], 'c': [[1], {'d': 2}]},
+])
+def test_load_json_df_matches_pandas(writable_pj, orient, data):
+    filepath = writable_pj.results_file('test_df.json')
+    pd.DataFrame(data).to_json(filepath, orient=orient)
+
+    df = writable_pj.load_json_df(filepath, orient=orient)
+    pd.testing.assert_frame_equal(df, pd.read_json(filepath, orient=orient))
+
 
-    remove(target_file)  # Cleanup
-    assert not isfile(target_file)
+def test_dump_df_as_json_roundtrip(writable_pj):
+    pj = writable_pj
+    df = pd.DataFrame({'foo': [1.5, None], 'bar': [[1, 2], {'a': 'b'}]},
+                      index=['x', 'y'])
+    target_file = pj.dump_df_as_json(df, 'test_df')
+
+    df_read = pj.load_json_df(target_file)
+    assert list(df_read.columns) == ['foo', 'bar']
+    assert list(df_read.index) == ['x', 'y']
+    assert df_read.loc['x', 'foo'] == 1.5
+    assert df_read.loc['y', 'bar'] == {'a': 'b'}
+
+    target_file = pj.dump_df_as_json(df, 'test_records', orient='records')
+    df_read = pj.load_json_df(target_file, orient='records')
+    assert list(df_read.columns) == ['foo', 'bar']
+    assert df_read['bar'].tolist() == [[1, 2], {'a': 'b'}]
+
+    target_file = pj.dump_df_as_json(df, 'test_lines.jsonl')
+    with open(target_file) as f:
+        assert len(f.readlines()) == 2
+    df_read = pj.load_json_df('test_lines')
+    assert list(df_read.columns) == ['foo', 'bar']
+    assert df_read['bar'].tolist() == [[1, 2], {'a': 'b'}]
+
+    # Dates are written and read back by pandas
+    df = pd.DataFrame({'date': pd.to_datetime(['2020-01-01', '2020-01-02'])})
+    target_file = pj.dump_df_as_json(df, 'test_df')
+    assert pj.load_json_df(target_file).equals(df)
 
 
-def test_read_csv(pj):
+def test_read_csv(pj, data_file_schema, caplog, monkeypatch):
     expected_columns = 'int_field string_field dicts lists'.split()
 
     # Test it infers the trailing '.csv'
     df = pj.read_csv('data_file', subdir='data')
-    assert df.columns.all(expected_columns)
+    assert list(df.columns) == expected_columns
 
     # Test it has the right amount of cols & rows
     df = pj.read_csv('data_file.csv', subdir='data')
@@ -172,6 +266,85 @@ def test_read_csv(pj):
 
     # Test it correctly passes arguments to pandas.read_csv
     df = pj.read_csv('data_file', subdir='data', usecols=[expected_columns[1]])
-    assert df.columns.all(expected_columns[1])
+    assert list(df.columns) == expected_columns[1:2]
     assert df.shape == (10, 1)
 
+    # With a known schema nothing has to be inferred
+    # caplog listens on the root logger, which csv2df doesn't propagate to
+    monkeypatch.setattr(csv2df.logger, 'propagate', True)
+    with caplog.at_level('INFO', logger='project.csv2df'):
+        df = pj.read_csv('data_file', subdir='data', **data_file_schema)
+    assert 'Parsed "dicts" as JSON' in caplog.text
+    assert df['int_field'].dtype == 'int32'
+    assert df['string_field'].dtype == 'string'
+    assert df['dicts'].map(type).eq(dict).all()
+    assert df['lists'].map(type).eq(list).all()
+
+
+def test_dump_df(writable_pj):
+    pj = writable_pj
+    df = pd.DataFrame({'foo': [1, 2], 'bar': [[1], [2]]})
+
+    assert pj.results_files() == []
+    target_file = pj.dump_df(df, 'test_df')
+    assert target_file == join(pj.results_dir, 'test_df.csv')
+    assert isfile(target_file)
+    # The listing is dropped after writing
+    assert str(pj.results_dir) not in pj._listing_cache
+    assert pj.results_files() == [target_file]
+
+    assert pj.read_csv('test_df').loc[1, 'bar'] == [2]
+
+    # A round-trip through a buffer doesn't touch the disk
+    buffer = BytesIO()
+    assert pj.dump_df(df, buffer, sep='\t') is buffer
+    df_read = pd.read_table(BytesIO(buffer.getvalue()))
+    assert df_read.loc[1, 'bar'] == '[2]'
+    assert pj.results_files() == [target_file]
+
+
+def test_dump_and_read_df_format(writable_pj):
+    pj = writable_pj
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'foo': [1, 2], 'bar': ['a', 'b']})
+
+    target_file = pj.dump_df(df, 'test_df', format='parquet')
+    assert target_file == join(pj.results_dir, 'test_df.parquet')
+
+    assert pj.read_df('test_df', format='parquet').equals(df)
+    assert pj.read_df('test_df').equals(df)
+
+    with pytest.raises(ValueError):
+        pj.read_df('test_df', format='xls')
+
+
+def test_dump_and_read_df_tsv(writable_pj):
+    pj = writable_pj
+    df = pd.DataFrame({'foo': [1, 2], 'bar': ['a', 'b']})
+
+    # index is still the fourth positional argument
+    target_file = pj.dump_df(df, 'test_df', 'results', True, format='tsv')
+    assert target_file == join(pj.results_dir, 'test_df.tsv')
+    assert pj.dump_df(df, 'test_df.tsv.gz', format='tsv').endswith('.tsv.gz')
+
+    read_df = pj.read_df('test_df', format='tsv', categorize=False)
+    assert list(read_df.columns) == ['Unnamed: 0', 'foo', 'bar']
+    assert read_df[['foo', 'bar']].equals(df)
+
+
+def test_save_last_plot(writable_pj):
+    pj = writable_pj
+    plt = pytest.importorskip('matplotlib.pyplot')
+
+    plt.plot([1, 2, 3])
+    pj.save_last_plot('test_plot.png', bbox_inches=None, dpi=50)
+    target_file = pj.results_file('test_plot.png')
+    assert isfile(target_file)
+    plt.close('all')
+
+
+def test_save_last_plot_without_matplotlib(writable_pj, monkeypatch):
+    pj = writable_pj
+    monkeypatch.setattr(Project, '_plt', False)
+    assert pj.save_last_plot('test_plot.png') is None
+    assert not isfile(pj.results_file('test_plot.png'))